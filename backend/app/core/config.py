@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os
-from functools import lru_cache
+from functools import cached_property, lru_cache
 from pathlib import Path
 
 from typing import Optional
@@ -29,27 +29,31 @@ class Settings(BaseSettings):
     default_profile_command: str = "pwsh" if os.name == "nt" else "bash"
     default_profile_name: str = "默认 PowerShell"
     git_diff_delay: float = 0.35
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    thread_pool_size: int = Field(default_factory=lambda: min(32, (os.cpu_count() or 1) + 4))
+    cors_allow_origins: list[str] = Field(default_factory=lambda: ["*"])
 
-    @property
+    @cached_property
     def resolved_data_dir(self) -> Path:
         directory = self.data_dir or self.base_dir / "backend" / "data"
         directory.mkdir(parents=True, exist_ok=True)
         return directory
 
-    @property
+    @cached_property
     def resolved_logs_dir(self) -> Path:
         directory = self.logs_dir or self.base_dir / "backend" / "logs"
         directory.mkdir(parents=True, exist_ok=True)
         return directory
 
-    @property
+    @cached_property
     def resolved_database_url(self) -> str:
         if self.database_url:
             return self.database_url
         db_path = self.resolved_data_dir / "terminal_manage.db"
         return f"sqlite:///{db_path.as_posix()}"
 
-    @property
+    @cached_property
     def resolved_default_cwd(self) -> Path:
         return self.default_cwd or self.base_dir
 
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+ALLOWED_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+
+
+class StaticCORSMiddleware:
+    """CORS for the wildcard-origin policy, with every header encoded once at startup.
+
+    Starlette's CORSMiddleware rebuilds header lists per response; when any origin is
+    allowed nothing depends on the request except the echoed preflight headers.
+    """
+
+    def __init__(self, app: ASGIApp, max_age: int = 600) -> None:
+        self.app = app
+        self._simple_headers = [(b"access-control-allow-origin", b"*")]
+        self._preflight_headers = [
+            (b"access-control-allow-origin", b"*"),
+            (b"access-control-allow-methods", ALLOWED_METHODS),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", b"2"),
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        has_origin = False
+        preflight = False
+        requested_headers = None
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                has_origin = True
+            elif key == b"access-control-request-method":
+                preflight = True
+            elif key == b"access-control-request-headers":
+                requested_headers = value
+        if not has_origin:
+            await self.app(scope, receive, send)
+            return
+        if preflight and scope["method"] == "OPTIONS":
+            headers = list(self._preflight_headers)
+            if requested_headers is not None:
+                headers.append((b"access-control-allow-headers", requested_headers))
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": b"OK"})
+            return
+
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *self._simple_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
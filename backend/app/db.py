@@ -2,15 +2,79 @@ from __future__ import annotations
 
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 
 from .core.config import get_settings
 
 settings = get_settings()
-connect_args = {"check_same_thread": False} if settings.resolved_database_url.startswith("sqlite") else {}
-engine = create_engine(settings.resolved_database_url, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+database_url = settings.resolved_database_url
+is_sqlite = database_url.startswith("sqlite")
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-64000",
+)
+# Status connections commit without fsync, so a power loss can drop recent status updates.
+# They share the main WAL, and a checkpoint runs on whichever connection crosses the threshold;
+# disabling auto-checkpoint here leaves checkpoints (which copy every table's pages into the
+# database file) to the synchronous=NORMAL connections, so profile data keeps its durability.
+STATUS_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA wal_autocheckpoint=0",
+    "PRAGMA temp_store=MEMORY",
+)
+is_memory_sqlite = database_url in {"sqlite://", "sqlite:///:memory:"}
+
+
+def _build_engine(pool_size: int, max_overflow: int):
+    if not is_sqlite:
+        return create_engine(
+            database_url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True
+        )
+    connect_args = {"check_same_thread": False, "timeout": 30}
+    if is_memory_sqlite:
+        # In-memory databases only exist per connection, so share a single one.
+        return create_engine(database_url, connect_args=connect_args, poolclass=StaticPool)
+    return create_engine(
+        database_url,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=True,
+    )
+
+
+def _install_sqlite_pragmas(target, pragmas: tuple[str, ...]) -> None:
+    @event.listens_for(target, "connect")
+    def _apply_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+engine = _build_engine(settings.db_pool_size, settings.db_max_overflow)
+if is_sqlite:
+    _install_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+
+if is_sqlite and not is_memory_sqlite:
+    status_engine = _build_engine(pool_size=2, max_overflow=2)
+    _install_sqlite_pragmas(status_engine, STATUS_SQLITE_PRAGMAS)
+else:
+    # Other backends and in-memory SQLite share the main engine.
+    status_engine = engine
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+StatusSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=status_engine)
 
 
 class Base(DeclarativeBase):
@@ -18,8 +82,8 @@ class Base(DeclarativeBase):
 
 
 @contextmanager
-def session_scope():
-    session = SessionLocal()
+def session_scope(factory: sessionmaker = SessionLocal):
+    session = factory()
     try:
         yield session
         session.commit()
@@ -30,9 +94,11 @@ def session_scope():
         session.close()
 
 
+def status_session_scope():
+    return session_scope(StatusSessionLocal)
+
+
 def get_db():
-    db = SessionLocal()
-    try:
+    # One unit of work per request: commit once on success, roll back on any error.
+    with session_scope() as db:
         yield db
-    finally:
-        db.close()
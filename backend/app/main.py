@@ -1,21 +1,27 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Response, WebSocket, WebSocketDisconnect
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import select, text
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import insert, lambda_stmt, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from .core.config import get_settings
-from .db import Base, engine, get_db, session_scope
+from .core.cors import StaticCORSMiddleware
+from .db import Base, engine, get_db
 from .models import SessionProfile, SessionRecord, SessionStatus
 from .schemas import (
     GitChangesResponse,
@@ -28,97 +34,171 @@ from .schemas import (
     SessionInfo,
     SessionCreateResponse,
     SessionSummary,
+    type_adapter,
 )
 from .services.session_manager import SessionManager
-from .utils.git import collect_git_overview
+from .utils.git import cached_git_overview, dir_has_git
+from .utils.logs import iter_log_chunks, parse_byte_range, read_log_tail
 
 # Windows 平台需要设置事件循环策略以支持子进程
 if os.name == "nt":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 settings = get_settings()
-app = FastAPI(title=settings.app_name)
+session_manager = SessionManager()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[dict[str, object]]:
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.thread_pool_size, thread_name_prefix="terminal-io")
+    )
+    await loop.run_in_executor(None, prepare_database)
+    yield {"session_manager": session_manager, "settings": settings}
+    await session_manager.close()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-    allow_credentials=True,
-)
+if settings.cors_allow_origins == ["*"]:
+    app.add_middleware(StaticCORSMiddleware)
+else:
+    # Explicit origin lists need the per-request origin echo that CORSMiddleware provides.
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_allow_origins,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        allow_credentials=True,
+    )
 
-session_manager = SessionManager()
+
+# Hot list queries are lambda statements so SQLAlchemy caches them without rebuilding the cache key.
+LIST_PROFILES_STMT = lambda_stmt(lambda: select(SessionProfile).order_by(SessionProfile.id))
+LIST_SESSIONS_STMT = lambda_stmt(lambda: select(SessionRecord).order_by(SessionRecord.created_at.desc()))
+
+# Static websocket frames are encoded once; the frontend parses text frames as JSON.
+PONG_FRAME = orjson.dumps({"type": "pong"}).decode()
+
+
+def output_frame(data: str) -> str:
+    return orjson.dumps({"type": "output", "data": data}).decode()
 
 
 def profile_to_schema(profile: SessionProfile) -> ProfileRead:
-    return ProfileRead(
+    # ORM rows are already validated on write; skip pydantic validation on read.
+    return ProfileRead.model_construct(
         id=profile.id,
         name=profile.name,
         command=profile.command,
-        args=profile.args_list(),
+        args=profile.args_list,
         cwd=profile.cwd,
-        env=profile.env_dict(),
+        env=profile.env_dict,
         created_at=profile.created_at,
         updated_at=profile.updated_at,
     )
 
 
-def ensure_session_columns() -> None:
+def json_response(schema: object, content: object) -> Response:
+    """Serialize ``content`` once through the cached adapter, bypassing response_model re-validation."""
+    return Response(content=type_adapter(schema).dump_json(content), media_type="application/json")
+
+
+# Bump when ensure_session_columns learns a new column or index so existing markers go stale.
+SESSION_SCHEMA_VERSION = 1
+_session_schema_current = False
+
+
+def session_schema_marker() -> Path:
+    return settings.resolved_data_dir / f".sessions_schema_v{SESSION_SCHEMA_VERSION}"
+
+
+def session_schema_is_current() -> bool:
+    global _session_schema_current
+    if _session_schema_current:
+        return True
+    if not settings.resolved_database_url.startswith("sqlite"):
+        _session_schema_current = True
+        return True
+    try:
+        # The marker records which database it was written for.
+        _session_schema_current = session_schema_marker().read_text(encoding="utf-8") == settings.resolved_database_url
+    except OSError:
+        _session_schema_current = False
+    return _session_schema_current
+
+
+def mark_session_schema_current() -> None:
+    global _session_schema_current
+    try:
+        session_schema_marker().write_text(settings.resolved_database_url, encoding="utf-8")
+    except OSError as exc:
+        logger.warning("无法写入迁移标记: %s", exc)
+    _session_schema_current = True
+
+
+def ensure_session_columns(conn: Connection) -> None:
     if not settings.resolved_database_url.startswith("sqlite"):
         return
-    with engine.begin() as conn:
-        existing = {row[1] for row in conn.execute(text("PRAGMA table_info('sessions')")).fetchall()}
-        if "status" not in existing:
-            conn.execute(text("ALTER TABLE sessions ADD COLUMN status TEXT DEFAULT 'running'"))
-        if "finished_at" not in existing:
-            conn.execute(text("ALTER TABLE sessions ADD COLUMN finished_at TEXT"))
-        if "exit_code" not in existing:
-            conn.execute(text("ALTER TABLE sessions ADD COLUMN exit_code INTEGER"))
-
-
-def mark_orphan_sessions() -> None:
-    with session_scope() as db:
-        updated = (
-            db.query(SessionRecord)
-            .filter(SessionRecord.status == SessionStatus.RUNNING)
-            .update(
-                {
-                    SessionRecord.status: SessionStatus.INTERRUPTED,
-                    SessionRecord.finished_at: datetime.utcnow(),
-                },
-                synchronize_session=False,
-            )
-        )
-        if updated:
-            logger.info("更新 %s 个未完成的会话状态为 interrupted", updated)
-
-
-def seed_default_profile() -> None:
-    with session_scope() as db:
-        exists = db.execute(select(SessionProfile).where(SessionProfile.name == settings.default_profile_name)).scalar_one_or_none()
-        if exists:
-            return
-        default_profile = SessionProfile(
-            name=settings.default_profile_name,
-            command=settings.default_profile_command,
-            args=json.dumps([]),
-            cwd=str(settings.resolved_default_cwd),
-            env_json=json.dumps({}),
-        )
-        db.add(default_profile)
+    existing = {row[1] for row in conn.execute(text("PRAGMA table_info('sessions')")).fetchall()}
+    if "status" not in existing:
+        conn.execute(text("ALTER TABLE sessions ADD COLUMN status TEXT DEFAULT 'running'"))
+    if "finished_at" not in existing:
+        conn.execute(text("ALTER TABLE sessions ADD COLUMN finished_at TEXT"))
+    if "exit_code" not in existing:
+        conn.execute(text("ALTER TABLE sessions ADD COLUMN exit_code INTEGER"))
+    # create_all only builds indexes for new tables; backfill them on existing databases.
+    for column in ("created_at", "status", "profile_id"):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_sessions_{column} ON sessions ({column})"))
+
+
+def mark_orphan_sessions(conn: Connection) -> None:
+    stmt = (
+        update(SessionRecord)
+        .where(SessionRecord.status == SessionStatus.RUNNING)
+        .values(status=SessionStatus.INTERRUPTED, finished_at=datetime.utcnow())
+    )
+    updated = conn.execute(stmt).rowcount
+    if updated:
+        logger.info("更新 %s 个未完成的会话状态为 interrupted", updated)
+
+
+def seed_default_profile(db: Session) -> None:
+    values = {
+        "name": settings.default_profile_name,
+        "command": settings.default_profile_command,
+        "args": orjson.dumps([]).decode(),
+        "cwd": str(settings.resolved_default_cwd),
+        "env_json": orjson.dumps({}).decode(),
+    }
+    if db.get_bind().dialect.name == "sqlite":
+        # Single round trip; the unique name makes repeat boots a no-op.
+        db.execute(sqlite_insert(SessionProfile).values(**values).on_conflict_do_nothing(index_elements=["name"]))
+        return
+    exists = db.execute(select(SessionProfile.id).where(SessionProfile.name == values["name"])).scalar_one_or_none()
+    if exists is None:
+        db.add(SessionProfile(**values))
 
 
-@app.on_event("startup")
-async def on_startup() -> None:
-    Base.metadata.create_all(bind=engine)
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, ensure_session_columns)
-    await loop.run_in_executor(None, mark_orphan_sessions)
-    await loop.run_in_executor(None, seed_default_profile)
+def prepare_database() -> None:
+    # Schema creation, migration and startup bookkeeping share one connection and transaction.
+    migrate = not session_schema_is_current()
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+        if migrate:
+            ensure_session_columns(conn)
+        mark_orphan_sessions(conn)
+        with Session(bind=conn) as db:
+            seed_default_profile(db)
+            db.flush()
+    if migrate:
+        # Only record the migration once its transaction has committed.
+        mark_session_schema_current()
 
 
 @app.get("/health")
@@ -129,9 +209,9 @@ def health() -> dict[str, str]:
 @app.get("/profiles", response_model=list[ProfileRead])
 def list_profiles(db: Session = Depends(get_db)):
     logger.info("收到 /profiles 请求")
-    profiles = db.execute(select(SessionProfile).order_by(SessionProfile.id)).scalars().all()
+    profiles = db.execute(LIST_PROFILES_STMT).scalars().all()
     logger.info(f"返回 {len(profiles)} 个配置")
-    return [profile_to_schema(p) for p in profiles]
+    return json_response(list[ProfileRead], [profile_to_schema(p) for p in profiles])
 
 
 @app.post("/profiles", response_model=ProfileRead, status_code=201)
@@ -139,17 +219,17 @@ def create_profile(payload: ProfileCreate, db: Session = Depends(get_db)):
     profile = SessionProfile(
         name=payload.name,
         command=payload.command,
-        args=json.dumps(payload.args),
+        args=orjson.dumps(payload.args).decode(),
         cwd=payload.cwd,
-        env_json=json.dumps(payload.env),
+        env_json=orjson.dumps(payload.env).decode(),
     )
     db.add(profile)
     try:
-        db.commit()
+        # Surface the unique-name violation here; get_db commits once the request succeeds.
+        db.flush()
     except IntegrityError as exc:
         db.rollback()
         raise HTTPException(status_code=400, detail="配置名称已存在") from exc
-    db.refresh(profile)
     return profile_to_schema(profile)
 
 
@@ -163,17 +243,17 @@ def update_profile(profile_id: int, payload: ProfileUpdate, db: Session = Depend
     if payload.command is not None:
         profile.command = payload.command
     if payload.args is not None:
-        profile.args = json.dumps(payload.args)
+        profile.args = orjson.dumps(payload.args).decode()
     if payload.cwd is not None:
         profile.cwd = payload.cwd
     if payload.env is not None:
-        profile.env_json = json.dumps(payload.env)
+        profile.env_json = orjson.dumps(payload.env).decode()
     try:
-        db.commit()
+        # Surface the unique-name violation here; get_db commits once the request succeeds.
+        db.flush()
     except IntegrityError as exc:
         db.rollback()
         raise HTTPException(status_code=400, detail="配置名称已存在") from exc
-    db.refresh(profile)
     return profile_to_schema(profile)
 
 
@@ -183,7 +263,11 @@ def delete_profile(profile_id: int, db: Session = Depends(get_db)):
     if not profile:
         raise HTTPException(status_code=404, detail="配置不存在")
     db.delete(profile)
-    db.commit()
+    try:
+        db.flush()
+    except IntegrityError as exc:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="配置仍有关联的会话，无法删除") from exc
     return Response(status_code=204)
 
 
@@ -193,24 +277,25 @@ async def create_session(payload: SessionCreateRequest, db: Session = Depends(ge
     if not profile:
         raise HTTPException(status_code=404, detail="配置不存在")
     quantity = max(1, min(payload.quantity, 10))
-    records: list[SessionRecord] = []
-    for _ in range(quantity):
-        context = await session_manager.create_session(profile)
-        record = SessionRecord(
-            id=context.session_id,
-            profile_id=profile.id,
-            cwd=str(context.cwd),
-            log_path=str(context.log_path),
-            status=SessionStatus.RUNNING,
-        )
-        db.add(record)
-        records.append(record)
-    db.commit()
-    for record in records:
-        db.refresh(record)
+    contexts = await asyncio.gather(*(session_manager.create_session(profile) for _ in range(quantity)))
+    rows = [
+        {
+            "id": context.session_id,
+            "profile_id": profile.id,
+            "cwd": str(context.cwd),
+            "log_path": str(context.log_path),
+            "status": SessionStatus.RUNNING,
+        }
+        for context in contexts
+    ]
+    # One multi-row INSERT ... RETURNING instead of N inserts plus N refresh SELECTs.
+    records = db.scalars(
+        insert(SessionRecord).returning(SessionRecord, sort_by_parameter_order=True),
+        rows,
+    ).all()
     profile_schema = profile_to_schema(profile)
     items = [
-        SessionInfo(
+        SessionInfo.model_construct(
             session_id=record.id,
             profile=profile_schema,
             status=record.status,
@@ -227,18 +312,23 @@ async def create_session(payload: SessionCreateRequest, db: Session = Depends(ge
 
 @app.get("/sessions", response_model=list[SessionSummary])
 def list_sessions(db: Session = Depends(get_db)):
-    stmt = (
-        select(SessionRecord, SessionProfile)
-        .join(SessionProfile, SessionRecord.profile_id == SessionProfile.id)
-        .order_by(SessionRecord.created_at.desc())
-    )
-    rows = db.execute(stmt).all()
+    records = db.execute(LIST_SESSIONS_STMT).scalars().all()
+    profile_ids = {record.profile_id for record in records}
+    profiles: dict[int, ProfileRead] = {}
+    if profile_ids:
+        # Serialize each profile once, however many sessions reference it.
+        ids = list(profile_ids)
+        stmt = lambda_stmt(lambda: select(SessionProfile).where(SessionProfile.id.in_(ids)))
+        profiles = {profile.id: profile_to_schema(profile) for profile in db.execute(stmt).scalars()}
     summaries: list[SessionSummary] = []
-    for record, profile in rows:
+    for record in records:
+        profile_schema = profiles.get(record.profile_id)
+        if profile_schema is None:
+            continue
         summaries.append(
-            SessionSummary(
+            SessionSummary.model_construct(
                 session_id=record.id,
-                profile=profile_to_schema(profile),
+                profile=profile_schema,
                 status=record.status,
                 exit_code=record.exit_code,
                 cwd=record.cwd,
@@ -247,21 +337,63 @@ def list_sessions(db: Session = Depends(get_db)):
                 finished_at=record.finished_at,
             )
         )
-    return summaries
+    return json_response(list[SessionSummary], summaries)
 
 
+# A sync def on purpose: FastAPI runs it in its threadpool, so the record lookup and every
+# file operation below stay off the event loop.
 @app.get("/logs/{session_id}", response_model=LogResponse)
-def fetch_log(session_id: str, db: Session = Depends(get_db)):
+def fetch_log(
+    session_id: str,
+    request: Request,
+    tail: Optional[int] = Query(default=None, ge=1, description="只返回日志末尾的 N KiB"),
+    stream: bool = Query(default=False, description="以 text/plain 流式返回原始日志，而非 JSON"),
+    db: Session = Depends(get_db),
+):
     record = db.get(SessionRecord, session_id)
     if not record:
         raise HTTPException(status_code=404, detail="Session 未找到")
-    content = session_manager.get_log_text(session_id)
+    limit = tail * 1024 if tail else None
+    # Streaming is opt-in: browsers and axios list text/plain in Accept even when they expect JSON.
+    if stream:
+        context = session_manager.get_or_none(session_id)
+        if context:
+            context.flush_log()
+        log_file = context.log_path if context else Path(record.log_path)
+        # Serve a snapshot of the bytes written so far; a live log keeps growing behind it.
+        try:
+            size = log_file.stat().st_size
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="日志文件不存在")
+        headers = {"Accept-Ranges": "bytes"}
+        span = None
+        range_header = request.headers.get("range")
+        if range_header:
+            try:
+                span = parse_byte_range(range_header, size)
+            except ValueError:
+                raise HTTPException(
+                    status_code=416, detail="日志范围无效", headers={"Content-Range": f"bytes */{size}"}
+                )
+        if span is None:
+            start = max(0, size - limit) if limit else 0
+            return StreamingResponse(
+                iter_log_chunks(log_file, start, size), media_type="text/plain; charset=utf-8", headers=headers
+            )
+        start, stop = span
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+        return StreamingResponse(
+            iter_log_chunks(log_file, start, stop),
+            status_code=206,
+            media_type="text/plain; charset=utf-8",
+            headers=headers,
+        )
+    content, active = session_manager.read_log(session_id, limit)
     if content is None:
-        log_file = Path(record.log_path)
-        if not log_file.exists():
+        try:
+            content = read_log_tail(Path(record.log_path), limit)
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="日志文件不存在")
-        content = log_file.read_bytes().decode("utf-8", errors="ignore")
-    active = session_manager.is_active(session_id)
     historical = record.status != SessionStatus.RUNNING or not active
     message = "以下内容来自历史日志，仅供回放。" if historical else None
     return LogResponse(session_id=session_id, content=content, historical=historical, message=message)
@@ -288,7 +420,7 @@ async def delete_session(session_id: str, db: Session = Depends(get_db)):
         await session_manager.terminate_session(session_id, reason="会话已删除")
     log_path = record.log_path
     db.delete(record)
-    db.commit()
+    db.flush()
     remove_log_artifacts(log_path)
     return Response(status_code=204)
 
@@ -296,18 +428,18 @@ async def delete_session(session_id: str, db: Session = Depends(get_db)):
 @app.get("/git_changes/{session_id}", response_model=GitChangesResponse)
 async def git_changes(session_id: str, db: Session = Depends(get_db)):
     context_cwd: Optional[Path] = None
-    if session_manager.has_session(session_id):
-        context_cwd = session_manager.get(session_id).cwd
+    context = session_manager.get_or_none(session_id)
+    if context:
+        context_cwd = context.cwd
     else:
         record = db.get(SessionRecord, session_id)
         if record and record.cwd:
             context_cwd = Path(record.cwd)
     if context_cwd is None:
         raise HTTPException(status_code=404, detail="Session 未找到")
-    git_dir = context_cwd / ".git"
-    if not git_dir.exists():
+    if not dir_has_git(context_cwd):
         return GitChangesResponse(git=False, message="not a git repository")
-    status_rows, diff_stat = await collect_git_overview(context_cwd)
+    status_rows, diff_stat = await cached_git_overview(context_cwd)
     status = None
     if status_rows is not None:
         status = [GitStatusEntry(status=row[0], path=row[1]) for row in status_rows]
@@ -329,11 +461,17 @@ async def session_socket(websocket: WebSocket, session_id: str):
     try:
         while True:
             message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
             text_data = message.get("text")
             if text_data is not None:
+                # Keystrokes arrive as raw text; only brace-prefixed frames can be control messages.
+                if not text_data.startswith("{"):
+                    await session_manager.send_input(session_id, text_data)
+                    continue
                 try:
-                    payload = json.loads(text_data)
-                except json.JSONDecodeError:
+                    payload = orjson.loads(text_data)
+                except orjson.JSONDecodeError:
                     await session_manager.send_input(session_id, text_data)
                     continue
                 msg_type = payload.get("type")
@@ -345,7 +483,7 @@ async def session_socket(websocket: WebSocket, session_id: str):
                     if isinstance(cols, int) and isinstance(rows, int):
                         await session_manager.resize_session(session_id, cols, rows)
                 elif msg_type == "ping":
-                    await websocket.send_json({"type": "pong"})
+                    await websocket.send_text(PONG_FRAME)
                 continue
             bytes_data = message.get("bytes")
             if bytes_data is not None:
@@ -353,8 +491,10 @@ async def session_socket(websocket: WebSocket, session_id: str):
     except WebSocketDisconnect:
         await session_manager.detach(session_id, websocket)
     except Exception as exc:
-        await websocket.send_json({"type": "output", "data": f"\r\n错误: {exc}\r\n"})
+        await websocket.send_text(output_frame(f"\r\n错误: {exc}\r\n"))
         await session_manager.detach(session_id, websocket)
+
+
 def remove_log_artifacts(log_path_str: str) -> None:
     try:
         log_path = Path(log_path_str)
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-import json
 from datetime import datetime
+from functools import cached_property
 from typing import Any, Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+import orjson
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
 from .db import Base
 
@@ -29,25 +30,35 @@ class SessionProfile(Base):
     args: Mapped[str] = mapped_column(Text, nullable=False, default="[]")
     cwd: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     env_json: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, server_default=func.now(), nullable=False
+    )
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+        DateTime, default=datetime.utcnow, server_default=func.now(), onupdate=datetime.utcnow, nullable=False
     )
 
     sessions: Mapped[list["SessionRecord"]] = relationship("SessionRecord", back_populates="profile")
 
+    @validates("args", "env_json")
+    def _reset_decoded(self, key: str, value: str) -> str:
+        # Drop memoized decodes so the next read reflects the new raw JSON.
+        self.__dict__.pop("args_list" if key == "args" else "env_dict", None)
+        return value
+
+    @cached_property
     def args_list(self) -> list[str]:
         try:
-            data = json.loads(self.args or "[]")
+            data = orjson.loads(self.args or "[]")
             return list(data) if isinstance(data, list) else []
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             return []
 
+    @cached_property
     def env_dict(self) -> dict[str, str]:
         try:
-            data: Any = json.loads(self.env_json or "{}")
+            data: Any = orjson.loads(self.env_json or "{}")
             return {str(k): str(v) for k, v in data.items()} if isinstance(data, dict) else {}
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             return {}
 
 
@@ -55,12 +66,14 @@ class SessionRecord(Base):
     __tablename__ = "sessions"
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
-    profile_id: Mapped[int] = mapped_column(ForeignKey("session_profiles.id"), nullable=False)
+    profile_id: Mapped[int] = mapped_column(ForeignKey("session_profiles.id"), nullable=False, index=True)
     cwd: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     log_path: Mapped[str] = mapped_column(String(500), nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, server_default=func.now(), nullable=False, index=True
+    )
     finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
-    status: Mapped[str] = mapped_column(String(32), default=SessionStatus.RUNNING, nullable=False)
+    status: Mapped[str] = mapped_column(String(32), default=SessionStatus.RUNNING, nullable=False, index=True)
     exit_code: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     profile: Mapped[SessionProfile] = relationship("SessionProfile", back_populates="sessions")
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from datetime import datetime
+from functools import lru_cache
 from typing import Any, Literal, Optional
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, TypeAdapter, validator
 
 SessionStatusLiteral = Literal["running", "completed", "stopped", "error", "interrupted"]
 
@@ -112,3 +113,8 @@ class SessionSummary(BaseModel):
     created_at: datetime
     finished_at: Optional[datetime] = None
 
+
+@lru_cache(maxsize=None)
+def type_adapter(schema: Any) -> TypeAdapter[Any]:
+    """Return a process-wide TypeAdapter; building one compiles a fresh core schema."""
+    return TypeAdapter(schema)
@@ -1,22 +1,44 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
+from types import MappingProxyType
 from typing import BinaryIO, Dict, Optional
 from uuid import uuid4
 
 import winpty as pywinpty
 from fastapi import WebSocket
+from sqlalchemy import update
 
 from ..core.config import get_settings
-from ..db import session_scope
+from ..db import status_session_scope
 from ..models import SessionRecord, SessionStatus
 from ..utils import git
+from ..utils.logs import read_log_tail
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+LOG_BUFFER_SIZE = 64 * 1024
+LOG_FLUSH_INTERVAL = 0.5
+OUTPUT_COALESCE_DELAY = 0.01
+BROADCAST_BATCH_SIZE = 50
+READ_CHUNK_SIZE = 64 * 1024
+# pywinpty's reader thread sends this placeholder through the PTY socket; it is not output.
+# The socket is a byte stream, so it can arrive glued to real output and is stripped anywhere.
+PTY_IGNORE_MARKER = b"0011Ignore"
+# Input characters that affect command tracking: Enter, Ctrl+C and Backspace/Delete.
+INPUT_CONTROL_RE = re.compile(r"[\r\n\x03\x08\x7f]")
+DB_WRITE_WORKERS = 1
+DB_WRITE_BATCH_WINDOW = 0.05
+# Force UTF-8 encoding for Python and general environment
+UTF8_ENV = MappingProxyType({"PYTHONIOENCODING": "utf-8", "LANG": "C.UTF-8"})
 
 
 @dataclass
@@ -30,11 +52,27 @@ class SessionContext:
     pty: Optional[pywinpty.PtyProcess] = None
     reader_task: Optional[asyncio.Task] = None
     monitor_task: Optional[asyncio.Task] = None
+    flush_task: Optional[asyncio.Task] = None
     sockets: set[WebSocket] = field(default_factory=set)
     log_file: Optional[BinaryIO] = None
-    command_buffer: str = ""
+    log_dirty: bool = False
+    command_buffer: list[str] = field(default_factory=list)
     cwd_has_git: bool = False
     lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    pending_output: list[bytes] = field(default_factory=list)
+    output_flush: Optional[asyncio.TimerHandle] = None
+    output_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def flush_log(self) -> None:
+        log_file = self.log_file
+        if log_file:
+            # Cleared before flushing: a write racing with the flush marks the log dirty again.
+            self.log_dirty = False
+            try:
+                log_file.flush()
+            except ValueError:
+                # Closed concurrently; close() already flushed it.
+                pass
 
     def close_log(self) -> None:
         if self.log_file:
@@ -44,17 +82,53 @@ class SessionContext:
                 self.log_file = None
 
     def cleanup_tasks(self) -> None:
-        for task in (self.reader_task, self.monitor_task):
+        for task in (self.reader_task, self.monitor_task, self.flush_task):
             if task and not task.done():
                 task.cancel()
         self.reader_task = None
         self.monitor_task = None
+        self.flush_task = None
+        if self.output_flush:
+            self.output_flush.cancel()
+            self.output_flush = None
 
 
 class SessionManager:
     def __init__(self) -> None:
         self._sessions: Dict[str, SessionContext] = {}
-        self._base_env = os.environ.copy()
+        self._base_env = MappingProxyType(os.environ.copy())
+        self._output_tasks: set[asyncio.Task] = set()
+        # The status writer is started lazily on the running loop and torn down by close(), so
+        # the manager survives repeated lifespans in one process (e.g. TestClient).
+        self._db_executor: Optional[ThreadPoolExecutor] = None
+        self._db_ops: Optional[asyncio.Queue[Optional[tuple[str, dict]]]] = None
+        self._db_writer: Optional[asyncio.Task] = None
+
+    async def close(self) -> None:
+        writer, queue, executor = self._db_writer, self._db_ops, self._db_executor
+        self._db_writer = self._db_ops = self._db_executor = None
+        if writer and queue is not None and not writer.done():
+            # ``None`` tells the writer to finish its current batch and exit.
+            queue.put_nowait(None)
+            await writer
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _ensure_db_writer(self) -> asyncio.Queue[Optional[tuple[str, dict]]]:
+        writer = self._db_writer
+        if writer is not None and not writer.done() and writer.get_loop() is asyncio.get_running_loop():
+            return self._db_ops
+        if self._db_executor is None:
+            # Status writes get their own thread so a slow database never starves PTY and git work.
+            self._db_executor = ThreadPoolExecutor(max_workers=DB_WRITE_WORKERS, thread_name_prefix="terminal-db")
+        # A queue is tied to the loop that first waits on it, so each writer gets a fresh one.
+        queue: asyncio.Queue[Optional[tuple[str, dict]]] = asyncio.Queue()
+        if self._db_ops is not None:
+            while not self._db_ops.empty():
+                queue.put_nowait(self._db_ops.get_nowait())
+        self._db_ops = queue
+        self._db_writer = asyncio.create_task(self._write_session_records(queue, self._db_executor))
+        return queue
 
     def get(self, session_id: str) -> SessionContext:
         context = self._sessions.get(session_id)
@@ -62,6 +136,9 @@ class SessionManager:
             raise KeyError(f"Session {session_id} not found")
         return context
 
+    def get_or_none(self, session_id: str) -> Optional[SessionContext]:
+        return self._sessions.get(session_id)
+
     def has_session(self, session_id: str) -> bool:
         return session_id in self._sessions
 
@@ -73,13 +150,9 @@ class SessionManager:
         session_id = str(uuid4())
         cwd = Path(profile.cwd or settings.resolved_default_cwd)
         command = [profile.command or settings.default_profile_command]
-        command.extend(profile.args_list())
-        env = self._base_env.copy()
-        env.update(profile.env_dict())
-        # Force UTF-8 encoding for Python and general environment
-        env["PYTHONIOENCODING"] = "utf-8"
-        env["LANG"] = "C.UTF-8"
-        
+        command.extend(profile.args_list)
+        env = {**self._base_env, **profile.env_dict, **UTF8_ENV}
+
         log_dir = settings.resolved_logs_dir / session_id
         log_dir.mkdir(parents=True, exist_ok=True)
         log_path = log_dir / "raw.log"
@@ -90,7 +163,7 @@ class SessionManager:
             cwd=cwd,
             env=env,
             log_path=log_path,
-            cwd_has_git=(cwd / ".git").exists(),
+            cwd_has_git=git.dir_has_git(cwd),
         )
         self._sessions[session_id] = context
         return context
@@ -168,22 +241,47 @@ class SessionManager:
             )
 
         context.pty = await loop.run_in_executor(None, _spawn)
-        context.log_file = open(context.log_path, "ab", buffering=0)
+        context.log_file = open(context.log_path, "ab", buffering=LOG_BUFFER_SIZE)
         context.reader_task = asyncio.create_task(self._read_pty(context))
         context.monitor_task = asyncio.create_task(self._monitor(context))
+        context.flush_task = asyncio.create_task(self._flush_log_periodically(context))
+
+    async def _flush_log_periodically(self, context: SessionContext) -> None:
+        loop = asyncio.get_running_loop()
+        while context.log_file is not None:
+            await asyncio.sleep(LOG_FLUSH_INTERVAL)
+            # Idle sessions have nothing buffered, so they skip the executor round-trip.
+            if context.log_dirty:
+                await loop.run_in_executor(None, context.flush_log)
 
     async def _read_pty(self, context: SessionContext) -> None:
         if not context.pty:
             return
         loop = asyncio.get_running_loop()
-        import codecs
-        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        # pywinpty relays the console through a local socket, which the selector loop can
+        # watch directly instead of parking an executor thread on a blocking read.
+        stream = getattr(context.pty, "fileobj", None)
+        if stream is not None:
+            closed = loop.create_future()
+            try:
+                fd = context.pty.fileno()
+                loop.add_reader(fd, self._on_pty_readable, context, stream.recv, closed)
+            except (AttributeError, NotImplementedError, OSError, ValueError):
+                pass
+            else:
+                stream.setblocking(False)
+                try:
+                    await closed
+                finally:
+                    loop.remove_reader(fd)
+                return
+
+        # Bound once; after the process exits the read simply fails and the loop below notices.
+        pty_read = context.pty.read
 
         def _read() -> str | bytes:
-            if not context.pty:
-                return ""
             try:
-                return context.pty.read(1024)
+                return pty_read(READ_CHUNK_SIZE)
             except Exception:
                 return ""
 
@@ -194,16 +292,28 @@ class SessionManager:
                     break
                 await asyncio.sleep(0.05)
                 continue
-            
-            text = ""
-            if isinstance(chunk, bytes):
-                text = decoder.decode(chunk, final=False)
-            else:
-                text = chunk
-                
-            if text:
-                self._write_log(context, text)
-                await self._broadcast_text(context, text)
+            # Output stays as raw bytes end to end; the browser terminal decodes UTF-8
+            # statefully, so sequences split across reads are reassembled there.
+            data = chunk if isinstance(chunk, bytes) else chunk.encode("utf-8", errors="ignore")
+            self._write_log(context, data)
+            self._queue_output(context, data)
+
+    def _on_pty_readable(self, context: SessionContext, recv, closed: asyncio.Future) -> None:
+        try:
+            data = recv(READ_CHUNK_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            if not closed.done():
+                closed.set_result(None)
+            return
+        data = data.replace(PTY_IGNORE_MARKER, b"")
+        if not data:
+            return
+        self._write_log(context, data)
+        self._queue_output(context, data)
 
     async def _monitor(self, context: SessionContext) -> None:
         if not context.pty:
@@ -223,27 +333,65 @@ class SessionManager:
         status = SessionStatus.COMPLETED if return_code == 0 else SessionStatus.ERROR
         await self._broadcast_text(context, f"\r\nProcess finished with code {return_code}\r\n")
         context.close_log()
-        reader_task = context.reader_task
-        if reader_task and not reader_task.done():
-            reader_task.cancel()
+        for task in (context.reader_task, context.flush_task):
+            if task and not task.done():
+                task.cancel()
         context.reader_task = None
         context.monitor_task = None
+        context.flush_task = None
         context.pty = None
         await self._update_session_record(context.session_id, status=status, exit_code=return_code)
         self._sessions.pop(context.session_id, None)
 
-    def _write_log(self, context: SessionContext, data: str) -> None:
+    def _write_log(self, context: SessionContext, data: bytes) -> None:
         if context.log_file:
-            context.log_file.write(data.encode("utf-8", errors="ignore"))
-            context.log_file.flush()
+            context.log_file.write(data)
+            context.log_dirty = True
+
+    def _queue_output(self, context: SessionContext, data: bytes) -> None:
+        # Coalesce PTY chunks arriving within a short window into a single frame.
+        context.pending_output.append(data)
+        if context.output_flush is None:
+            loop = asyncio.get_running_loop()
+            context.output_flush = loop.call_later(OUTPUT_COALESCE_DELAY, self._start_output_flush, context)
+
+    def _start_output_flush(self, context: SessionContext) -> None:
+        context.output_flush = None
+        task = asyncio.get_running_loop().create_task(self._flush_output(context))
+        self._output_tasks.add(task)
+        task.add_done_callback(self._output_tasks.discard)
+
+    async def _flush_output(self, context: SessionContext) -> None:
+        if context.output_flush:
+            context.output_flush.cancel()
+            context.output_flush = None
+        if not context.pending_output:
+            return
+        data = b"".join(context.pending_output)
+        context.pending_output.clear()
+        # The lock is FIFO, so frames reach every socket in the order they were flushed.
+        async with context.output_lock:
+            await self._fan_out(context, data)
+
+    async def _fan_out(self, context: SessionContext, frame: bytes) -> None:
+        # ``frame`` is the coalesced raw PTY output, sent unchanged as one binary message to every client.
+        sockets = list(context.sockets)
+        for start in range(0, len(sockets), BROADCAST_BATCH_SIZE):
+            if start:
+                # Let other sessions run between batches of a large audience.
+                await asyncio.sleep(0)
+            batch = sockets[start : start + BROADCAST_BATCH_SIZE]
+            results = await asyncio.gather(
+                *(socket.send_bytes(frame) for socket in batch), return_exceptions=True
+            )
+            for socket, result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    context.sockets.discard(socket)
 
     async def _broadcast_text(self, context: SessionContext, text: str) -> None:
-        payload = {"type": "output", "data": text}
-        for socket in list(context.sockets):
-            try:
-                await socket.send_json(payload)
-            except Exception:
-                context.sockets.discard(socket)
+        # Flush immediately, behind any output still waiting to be coalesced.
+        context.pending_output.append(text.encode("utf-8"))
+        await self._flush_output(context)
 
     async def send_input(self, session_id: str, data: str) -> None:
         context = self.get(session_id)
@@ -280,16 +428,26 @@ class SessionManager:
                 await self._write_to_pty(context, "".join(buffer))
                 buffer.clear()
 
-        for char in data:
+        start = 0
+        for match in INPUT_CONTROL_RE.finditer(data):
+            # Plain text between control characters is handled as one run
+            run = data[start : match.start()]
+            if run:
+                context.command_buffer.extend(run)
+                buffer.append(run)
+            start = match.end()
+            char = match.group()
+
             # Handle Backspace/Delete
             if char in {"\u0008", "\u007f"}:
-                context.command_buffer = context.command_buffer[:-1]
+                if context.command_buffer:
+                    context.command_buffer.pop()
                 buffer.append(char)
                 continue
             
             # Handle Ctrl+C
             if char == "\u0003":
-                context.command_buffer = ""
+                context.command_buffer.clear()
                 buffer.append(char)
                 await flush_buffer()
                 continue
@@ -298,12 +456,11 @@ class SessionManager:
             if char in {"\r", "\n"}:
                 await flush_buffer()
                 await self._handle_newline(context, char)
-                continue
-                
-            # Normal characters
-            context.command_buffer += char
-            buffer.append(char)
-            
+
+        run = data[start:]
+        if run:
+            context.command_buffer.extend(run)
+            buffer.append(run)
         await flush_buffer()
 
     async def _check_git_diff(
@@ -344,17 +501,19 @@ class SessionManager:
         
         # Only trigger git logic on Return (\r)
         if char == "\r":
-            if not context.cwd_has_git and (context.cwd / ".git").exists():
-                context.cwd_has_git = True
-                
-            if context.cwd_has_git:
-                try:
-                    # This might still take a few ms, but unavoidable if we want "before" state
-                    before_snapshot = await git.get_git_status(context.cwd)
-                    command_label = context.command_buffer.strip()
-                except Exception:
-                    pass
-            context.command_buffer = ""
+            command_label = "".join(context.command_buffer).strip()
+            context.command_buffer.clear()
+            # Bare Enters and read-only commands cannot produce a diff worth reporting
+            if command_label and not git.is_read_only_command(command_label):
+                if not context.cwd_has_git and git.dir_has_git(context.cwd):
+                    context.cwd_has_git = True
+
+                if context.cwd_has_git:
+                    try:
+                        # Usually served from the previous "after" snapshot while the index is unchanged
+                        before_snapshot = await git.get_git_status(context.cwd, reuse=True)
+                    except Exception:
+                        pass
             
         # Write the actual newline character(s) to PTY
         # Windows PTY typically expects \r for Enter
@@ -380,13 +539,17 @@ class SessionManager:
 
         await loop.run_in_executor(None, _write)
 
-    def get_log_text(self, session_id: str) -> Optional[str]:
+    def read_log(self, session_id: str, limit: Optional[int] = None) -> tuple[Optional[str], bool]:
+        # Blocking; called from the threadpool that serves sync endpoints.
         context = self._sessions.get(session_id)
-        log_path = context.log_path if context else None
-        if log_path is None or not log_path.exists():
-            return None
-        data = log_path.read_bytes()
-        return data.decode("utf-8", errors="ignore")
+        if context is None:
+            return None, False
+        active = bool(context.pty and context.pty.isalive())
+        context.flush_log()
+        try:
+            return read_log_tail(context.log_path, limit), active
+        except FileNotFoundError:
+            return None, active
 
     def resolve_log_path(self, session_id: str) -> Optional[Path]:
         context = self._sessions.get(session_id)
@@ -398,20 +561,49 @@ class SessionManager:
         status: Optional[str] = None,
         exit_code: Optional[int] = None,
     ) -> None:
+        values: dict = {}
+        if status:
+            values["status"] = status
+            if status in SessionStatus.FINAL_STATES:
+                values["finished_at"] = datetime.utcnow()
+            elif status == SessionStatus.RUNNING:
+                values["finished_at"] = None
+        if exit_code is not None:
+            values["exit_code"] = exit_code
+        if not values:
+            return
+        self._ensure_db_writer().put_nowait((session_id, values))
+
+    async def _write_session_records(
+        self,
+        queue: asyncio.Queue[Optional[tuple[str, dict]]],
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        # Updates arriving within DB_WRITE_BATCH_WINDOW are merged per session and written
+        # in a single transaction.
         loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            batch: dict[str, dict] = {item[0]: dict(item[1])}
+            await asyncio.sleep(DB_WRITE_BATCH_WINDOW)
+            stopping = False
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.setdefault(item[0], {}).update(item[1])
+            try:
+                await loop.run_in_executor(executor, self._apply_session_updates, batch)
+            except Exception:
+                logger.exception("Failed to write status for sessions %s", ", ".join(batch))
+            if stopping:
+                return
 
-        def _task() -> None:
-            with session_scope() as db:
-                record = db.get(SessionRecord, session_id)
-                if not record:
-                    return
-                if status:
-                    record.status = status
-                    if status in SessionStatus.FINAL_STATES:
-                        record.finished_at = datetime.utcnow()
-                    elif status == SessionStatus.RUNNING:
-                        record.finished_at = None
-                if exit_code is not None:
-                    record.exit_code = exit_code
-
-        await loop.run_in_executor(None, _task)
+    @staticmethod
+    def _apply_session_updates(batch: dict[str, dict]) -> None:
+        with status_session_scope() as db:
+            for session_id, values in batch.items():
+                db.execute(update(SessionRecord).where(SessionRecord.id == session_id).values(**values))
@@ -1,59 +1,154 @@
 from __future__ import annotations
 
 import asyncio
+import os
+import re
 import subprocess
+import time
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 GIT_BINARY = "git"
+GIT_DIR_PROBE_TTL = 5.0
+GIT_OVERVIEW_TTL = 2.0
+
+# Porcelain v2 records: number of space-separated fields before the path, per record type.
+PORCELAIN_PATH_FIELDS = {b"1": 8, b"2": 9, b"u": 10}
+PORCELAIN_UNTRACKED_CODES = {b"?": "??", b"!": "!!"}
+
+DELTA_HEADER = "=== Git Diff Before/After ==="
+DELTA_FOOTER = "=============================="
+DELTA_SECTIONS = (("added", "Added:"), ("modified", "Modified:"), ("deleted", "Deleted:"))
+NO_CHANGES_DELTA = f"{DELTA_HEADER}\n无文件变更\n{DELTA_FOOTER}"
+
+# Commands that cannot change the worktree skip the before/after git snapshots. Anything with
+# chaining, pipes, redirection or substitution falls through: `cat a > b` and `echo $(touch x)`
+# both write.
+READ_ONLY_COMMAND_RE = re.compile(
+    r"(?:ls|ll|dir|cd|pwd|cat|less|more|head|tail|history|echo|clear|cls|type|whoami|exit"
+    r"|gci|gc|sl|get-childitem|get-content|get-location|set-location"
+    r"|git\s+(?:status|log|diff|show|branch))(?:\s[^;&|<>`$(]*)?",
+    re.IGNORECASE,
+)
+
+GitOverview = Tuple[Optional[list[tuple[str, str]]], Optional[str]]
+_status_cache: dict[str, tuple[tuple[int, int], dict[str, str]]] = {}
+_overview_cache: dict[tuple[str, int], tuple[float, "asyncio.Future[GitOverview]"]] = {}
+
+
+@lru_cache(maxsize=256)
+def _git_dir_probe(cwd: str, tick: int) -> bool:
+    # ``tick`` only partitions the cache so a probe result expires after GIT_DIR_PROBE_TTL.
+    return os.path.exists(os.path.join(cwd, ".git"))
+
+
+def dir_has_git(cwd: Path) -> bool:
+    return _git_dir_probe(str(cwd), int(time.monotonic() // GIT_DIR_PROBE_TTL))
+
+
+def is_read_only_command(command: str) -> bool:
+    return READ_ONLY_COMMAND_RE.fullmatch(command) is not None
+
+
+def _run_git_blocking(args: list[str], cwd: Path) -> tuple[int, bytes]:
+    try:
+        completed = subprocess.run(
+            [GIT_BINARY, *args],
+            cwd=str(cwd),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False,
+        )
+        return completed.returncode, completed.stdout
+    except FileNotFoundError:
+        return 1, b""
+
+
+async def _run_git_bytes(args: list[str], cwd: Path) -> Optional[bytes]:
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            GIT_BINARY,
+            *args,
+            cwd=str(cwd),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        return None
+    except NotImplementedError:
+        # The Windows selector loop cannot spawn subprocesses; fall back to a worker thread.
+        loop = asyncio.get_running_loop()
+        return_code, stdout = await loop.run_in_executor(None, _run_git_blocking, args, cwd)
+    else:
+        stdout, _ = await proc.communicate()
+        return_code = proc.returncode
+    if return_code != 0:
+        return None
+    return stdout
 
 
 async def _run_git(args: list[str], cwd: Path) -> Optional[str]:
-    loop = asyncio.get_running_loop()
-
-    def _exec() -> tuple[int, bytes]:
-        try:
-            completed = subprocess.run(
-                [GIT_BINARY, *args],
-                cwd=str(cwd),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=False,
-            )
-            return completed.returncode, completed.stdout
-        except FileNotFoundError:
-            return 1, b""
-
-    return_code, stdout = await loop.run_in_executor(None, _exec)
-    if return_code != 0:
+    stdout = await _run_git_bytes(args, cwd)
+    if stdout is None:
         return None
     return stdout.decode("utf-8", errors="ignore")
 
 
-async def get_git_status(cwd: Path) -> Optional[dict[str, str]]:
-    output = await _run_git(["status", "--short"], cwd)
+def _parse_porcelain_v2(output: bytes) -> list[tuple[str, str]]:
+    # Codes match ``--short``: unmodified ("." in v2) sides are dropped, untracked is "??".
+    rows: list[tuple[str, str]] = []
+    records = iter(output.split(b"\x00"))
+    for record in records:
+        kind = record[:1]
+        untracked = PORCELAIN_UNTRACKED_CODES.get(kind)
+        if untracked is not None:
+            rows.append((untracked, record[2:].decode("utf-8", errors="replace")))
+            continue
+        path_field = PORCELAIN_PATH_FIELDS.get(kind)
+        if path_field is None:
+            continue
+        fields = record.split(b" ", path_field)
+        if kind == b"2":
+            # Renames and copies are followed by a separate record holding the original path.
+            next(records, None)
+        status_code = fields[1].replace(b".", b"").decode("ascii")
+        rows.append((status_code, fields[path_field].decode("utf-8", errors="replace")))
+    return rows
+
+
+def _status_fingerprint(cwd: Path) -> Optional[tuple[int, int]]:
+    git_dir = cwd / ".git"
+    try:
+        return os.stat(git_dir / "index").st_mtime_ns, os.stat(git_dir / "HEAD").st_mtime_ns
+    except OSError:
+        return None
+
+
+async def get_git_status(cwd: Path, reuse: bool = False) -> Optional[dict[str, str]]:
+    # With ``reuse`` the last snapshot for ``cwd`` is returned while .git/index and .git/HEAD
+    # are untouched. Unstaged worktree edits do not move either, so only "before" snapshots opt in.
+    key = str(cwd)
+    fingerprint = _status_fingerprint(cwd)
+    if reuse and fingerprint is not None:
+        cached = _status_cache.get(key)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+    output = await _run_git_bytes(["status", "--porcelain=v2", "-z"], cwd)
     if output is None:
+        _status_cache.pop(key, None)
         return None
-    status: dict[str, str] = {}
-    for line in output.splitlines():
-        if not line.strip():
-            continue
-        status_code = line[:2].strip()
-        path = line[3:].strip()
-        status[path] = status_code
+    status = {path: status_code for status_code, path in _parse_porcelain_v2(output)}
+    if fingerprint is not None:
+        _status_cache[key] = (fingerprint, status)
     return status
 
 
 async def get_git_status_rows(cwd: Path) -> Optional[list[tuple[str, str]]]:
-    output = await _run_git(["status", "--short"], cwd)
+    output = await _run_git_bytes(["status", "--porcelain=v2", "-z"], cwd)
     if output is None:
         return None
-    rows: list[tuple[str, str]] = []
-    for line in output.splitlines():
-        if not line.strip():
-            continue
-        rows.append((line[:2].strip(), line[3:].strip()))
-    return rows
+    return _parse_porcelain_v2(output)
 
 
 async def get_git_diff_stat(cwd: Path) -> Optional[str]:
@@ -61,42 +156,62 @@ async def get_git_diff_stat(cwd: Path) -> Optional[str]:
 
 
 def diff_status(before: dict[str, str], after: dict[str, str]) -> dict[str, list[str]]:
-    delta = {
-        "added": [],
-        "modified": [],
-        "deleted": [],
+    before_paths, after_paths = before.keys(), after.keys()
+    # Key views support set algebra in C; only the differing paths get formatted, in path order.
+    changed = [path for path in after_paths & before_paths if before[path] != after[path]]
+    return {
+        "added": [f"{path} ({after[path]})" for path in sorted(after_paths - before_paths)],
+        "modified": [f"{path} ({before[path]} -> {after[path]})" for path in sorted(changed)],
+        "deleted": [f"{path} ({before[path]})" for path in sorted(before_paths - after_paths)],
     }
-    for path, status in after.items():
-        if path not in before:
-            delta["added"].append(f"{path} ({status})")
-        elif before[path] != status:
-            delta["modified"].append(f"{path} ({before[path]} -> {status})")
-    for path, status in before.items():
-        if path not in after:
-            delta["deleted"].append(f"{path} ({status})")
-    return delta
 
 
 def format_delta(delta: Dict[str, List[str]], command: Optional[str] = None) -> str:
-    if all(len(values) == 0 for values in delta.values()):
-        return "=== Git Diff Before/After ===\n无文件变更\n=============================="
-    lines = ["=== Git Diff Before/After ==="]
+    if not any(delta.values()):
+        return NO_CHANGES_DELTA
+    parts = [DELTA_HEADER]
     if command:
-        lines.append(f"Command: {command}")
-    if delta["added"]:
-        lines.append("Added:")
-        lines.extend(f"  {item}" for item in delta["added"])
-    if delta["modified"]:
-        lines.append("Modified:")
-        lines.extend(f"  {item}" for item in delta["modified"])
-    if delta["deleted"]:
-        lines.append("Deleted:")
-        lines.extend(f"  {item}" for item in delta["deleted"])
-    lines.append("==============================")
-    return "\n".join(lines)
-
-
-async def collect_git_overview(cwd: Path) -> Tuple[Optional[list[tuple[str, str]]], Optional[str]]:
-    status = await get_git_status_rows(cwd)
-    diff_stat = await get_git_diff_stat(cwd)
+        parts.append(f"Command: {command}")
+    for key, title in DELTA_SECTIONS:
+        items = delta[key]
+        if items:
+            parts.append(title)
+            parts.append("  " + "\n  ".join(items))
+    parts.append(DELTA_FOOTER)
+    return "\n".join(parts)
+
+
+async def collect_git_overview(cwd: Path) -> GitOverview:
+    status, diff_stat = await asyncio.gather(get_git_status_rows(cwd), get_git_diff_stat(cwd))
     return status, diff_stat
+
+
+def _index_mtime_ns(cwd: Path) -> int:
+    try:
+        return os.stat(cwd / ".git" / "index").st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _drop_failed_overview(key: tuple[str, int], future: "asyncio.Future[GitOverview]") -> None:
+    if future.cancelled() or future.exception() is not None:
+        entry = _overview_cache.get(key)
+        if entry and entry[1] is future:
+            del _overview_cache[key]
+
+
+async def cached_git_overview(cwd: Path) -> GitOverview:
+    # Concurrent callers for the same repository and index mtime share one git run. Entries
+    # expire after GIT_OVERVIEW_TTL, which also bounds staleness for unstaged worktree edits.
+    now = time.monotonic()
+    for stale_key in [key for key, (created, _) in _overview_cache.items() if now - created > GIT_OVERVIEW_TTL]:
+        del _overview_cache[stale_key]
+    key = (str(cwd), _index_mtime_ns(cwd))
+    entry = _overview_cache.get(key)
+    if entry is None:
+        future = asyncio.ensure_future(collect_git_overview(cwd))
+        future.add_done_callback(lambda done, key=key: _drop_failed_overview(key, done))
+        entry = (now, future)
+        _overview_cache[key] = entry
+    # Shield so one cancelled request does not cancel the run other callers are awaiting.
+    return await asyncio.shield(entry[1])
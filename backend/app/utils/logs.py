@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterator, Optional
+
+LOG_CHUNK_SIZE = 64 * 1024
+
+
+def parse_byte_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    # Returns the [start, stop) span of a single "bytes=" range, or None when the header should
+    # be ignored (other units, multiple ranges, malformed). Raises ValueError if unsatisfiable.
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # Suffix range: the final N bytes.
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - suffix), size
+    start = int(first)
+    stop = int(last) + 1 if last else size
+    if last and stop <= start:
+        return None
+    if start >= size:
+        raise ValueError("range starts beyond the end of the log")
+    return start, min(stop, size)
+
+
+def read_log_tail(log_path: Path, limit: Optional[int] = None) -> str:
+    with log_path.open("rb") as handle:
+        if limit is not None:
+            size = handle.seek(0, os.SEEK_END)
+            handle.seek(max(0, size - limit))
+        data = handle.read()
+    # A tail may start mid-character; undecodable leading bytes are dropped.
+    return data.decode("utf-8", errors="ignore")
+
+
+def iter_log_chunks(
+    log_path: Path,
+    start: int = 0,
+    stop: Optional[int] = None,
+    chunk_size: int = LOG_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    with log_path.open("rb") as handle:
+        handle.seek(start)
+        remaining = None if stop is None else stop - start
+        while remaining is None or remaining > 0:
+            chunk = handle.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,43 @@
+import pytest
+
+from app.utils.git import is_read_only_command
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "ls",
+        "ls -la src",
+        "cd ..",
+        "cat README.md",
+        "Get-ChildItem",
+        "git status",
+        "git log --oneline -5",
+        "echo hello world",
+    ],
+)
+def test_read_only_commands_are_recognised(command):
+    assert is_read_only_command(command)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "make",
+        "rm -rf build",
+        "git commit -m x",
+        "git statusx",
+        "lsblk",
+        "cat a > b",
+        "ls | tee out",
+        "cd x && rm y",
+        "cd x; rm y",
+        "echo `touch x`",
+        "echo $(touch x)",
+        "cat <(git stash)",
+        "cat < input",
+        "echo $HOME",
+    ],
+)
+def test_mutating_or_compound_commands_fall_through(command):
+    assert not is_read_only_command(command)
@@ -40,8 +40,8 @@ interface SessionRuntime {
   status: TerminalStatus;
 }
 
-const safeWrite = (term: Terminal, text: string, callback?: () => void) => {
-  if (!text) {
+const safeWrite = (term: Terminal, data: string | Uint8Array, callback?: () => void) => {
+  if (!data.length) {
     if (callback) {
       callback();
     }
@@ -49,9 +49,9 @@ const safeWrite = (term: Terminal, text: string, callback?: () => void) => {
   }
   try {
     if (callback) {
-      term.write(text, callback);
+      term.write(data, callback);
     } else {
-      term.write(text);
+      term.write(data);
     }
   } catch (error) {
     console.warn("terminal write skipped", error);
@@ -168,8 +168,8 @@ const LiveTerminalManager = ({ sessionId, sessionIds = [], note, onStatusChange
   }, []);
 
   const handleIncoming = useCallback((runtime: SessionRuntime, raw: MessageEvent["data"]) => {
-    const applyText = (text?: string) => {
-      if (!text) {
+    const applyText = (text?: string | Uint8Array) => {
+      if (!text?.length) {
         return;
       }
       safeWrite(runtime.term, text, () => {
@@ -204,12 +204,13 @@ const LiveTerminalManager = ({ sessionId, sessionIds = [], note, onStatusChange
       applyText(raw);
       return;
     }
+    // 二进制帧是原始终端输出，交给 xterm 按 UTF-8 流式解码，避免多字节字符被拆开
     if (raw instanceof Blob) {
-      void raw.text().then((text) => applyText(text));
+      void raw.arrayBuffer().then((buffer) => applyText(new Uint8Array(buffer)));
       return;
     }
     if (raw instanceof ArrayBuffer) {
-      applyText(new TextDecoder().decode(raw));
+      applyText(new Uint8Array(raw));
     }
   }, []);
 
@@ -219,6 +220,7 @@ const LiveTerminalManager = ({ sessionId, sessionIds = [], note, onStatusChange
         return;
       }
       const socket = new WebSocket(websocketUrl(runtime.id));
+      socket.binaryType = "arraybuffer";
       runtime.socket = socket;
       updateStatus(runtime.id, "connecting");
       socket.onopen = () => {